@@ -0,0 +1,374 @@
+"""
+Load generator for the consumer side of the gateway.
+
+Starts main.py in a scratch directory with a generated config whose only slave
+is the synthetic one (type: "sim", see modbus_sim.py), then for each step opens
+N OPC UA sessions (each monitoring all M items) and K /ws clients, some of them
+deliberately slow. Every sim value is "<seq>@<unix time>", so each subscriber
+can measure notification latency, count the sequence numbers it missed
+(dropped) and how far it still trails the newest value (behind).
+
+Example - ramp 1 -> 10 -> 50 clients, 20 items, 2 slow dashboards per step:
+    python loadtest.py --opc-clients 1,10,50 --ws-clients 1,10,50 --slow-ws 2 --items 20 --json result.json
+
+Notes:
+  - Gateway CPU / RSS / thread count are read from /proc (Linux only).
+  - The web server always listens on 8080 (see web.start_web), so nothing else may use that port.
+  - Keep --publish-ms below --poll-interval, otherwise OPC UA coalescing is counted as drops.
+  - --profile-dir captures a /profile session of the gateway per step (folded stacks
+    for sampling, .prof for cprofile) so hot spots can be compared across client counts.
+    The profiler's own overhead lands in that step's CPU and latency; such steps carry
+    "profile_mode" in the results, so compare them only with runs profiled the same way.
+  - Clients run in this process; at very high counts the harness itself can become
+    the bottleneck, so watch its CPU as well.
+"""
+import os
+import sys
+import json
+import time
+import yaml
+import socket
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.request
+
+import websockets
+from opcua import Client
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+WEB_PORT = 8080
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+
+class Recorder:
+    """Collects latency samples and seen sequence numbers for one subscriber."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = False
+        self.latencies = []
+        self.last_latency = None
+        self.seqs = {}  # node_id -> set of seq
+
+    def record(self, node_id, value):
+        if not self.active or not isinstance(value, str) or "@" not in value:
+            return
+        now = time.time()
+        try:
+            seq, stamp = value.split("@", 1)
+            seq, stamp = int(seq), float(stamp)
+        except ValueError:
+            return
+        with self.lock:
+            self.latencies.append(now - stamp)
+            self.last_latency = now - stamp
+            self.seqs.setdefault(node_id, set()).add(seq)
+
+class OpcSession:
+    """One OPC UA client session with a single subscription over all items."""
+    def __init__(self, url, user, pwd, node_ids, publish_ms):
+        self.client = Client(url)
+        self.client.set_user(user)
+        self.client.set_password(pwd)
+        self.node_ids = node_ids
+        self.publish_ms = publish_ms
+        self.recorder = Recorder()
+
+    def start(self):
+        self.client.connect()
+        nodes = [self.client.get_node(n) for n in self.node_ids]
+        sub = self.client.create_subscription(self.publish_ms, self)
+        sub.subscribe_data_change(nodes)
+
+    def stop(self):
+        try:
+            self.client.disconnect()
+        except Exception:
+            pass
+
+    def datachange_notification(self, node, val, data):
+        self.recorder.record(node.nodeid.to_string(), val)
+
+async def ws_client(url, recorder, delay):
+    """A dashboard on /ws. A non-zero delay makes it a slow consumer."""
+    try:
+        async with websockets.connect(url) as ws:
+            async for raw in ws:
+                for node_id, payload in json.loads(raw).items():
+                    if isinstance(payload, dict):
+                        recorder.record(node_id, payload.get("value"))
+                if delay:
+                    await asyncio.sleep(delay)
+    except (OSError, websockets.InvalidHandshake) as e:
+        raise RuntimeError(f"/ws client could not connect to {url}: {e}") from e
+    except websockets.ConnectionClosed as e:
+        raise RuntimeError(f"/ws client was disconnected: {e}") from e
+    # Only cancellation at the end of the window may stop a client
+    raise RuntimeError("/ws connection closed by the gateway")
+
+def ws_failures(tasks):
+    """Errors of /ws client tasks that ended on their own (cancelled ones are fine)"""
+    return [t.exception() for t in tasks if t.done() and not t.cancelled() and t.exception()]
+
+async def stop_ws(tasks):
+    """
+    Cancels the /ws clients and fails the step if any of them had already
+    died - a dead client would otherwise just look like one that lags.
+    """
+    errors = ws_failures(tasks)
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if errors:
+        raise RuntimeError(f"{len(errors)} of {len(tasks)} /ws clients failed, first: {errors[0]}")
+
+# --- Gateway process ---
+
+def build_config(args):
+    nodes = []
+    for i in range(args.items):
+        nodes.append({
+            "name": f"Load_{i}",
+            "node_id": f"ns=2;s=Load_{i}",
+            "access": "read",
+            "modbus": {"slave": "sim", "function": "input", "address": i + 1,
+                       "datatype": "string", "length": 16},
+        })
+    return {
+        "opcua": {"endpoint": f"opc.tcp://0.0.0.0:{args.opc_port}/", "namespace": "urn:opcua:modbus:loadtest"},
+        "modbus": {"poll_interval": args.poll_interval, "slaves": {"sim": {"type": "sim"}}},
+        "nodes": nodes,
+    }
+
+def spawn_gateway(workdir, args, env):
+    with open(os.path.join(workdir, "config.yaml"), "w") as f:
+        yaml.safe_dump(build_config(args), f, sort_keys=False)
+    out = open(os.path.join(workdir, "gateway.out"), "w")
+    proc = subprocess.Popen([sys.executable, os.path.join(HERE, "main.py")],
+                            cwd=workdir, env=env, stdout=out, stderr=subprocess.STDOUT)
+
+    # Wait until both the OPC UA and the web port accept connections
+    deadline = time.time() + 30
+    for port in (args.opc_port, WEB_PORT):
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"Gateway exited early, see {workdir}/gateway.out")
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if time.time() > deadline:
+                    proc.kill()
+                    raise RuntimeError(f"Gateway did not open port {port}, see {workdir}/gateway.out")
+                time.sleep(0.2)
+    return proc
+
+def proc_sample(pid):
+    """Returns (cpu seconds, rss MB, threads) for a process from /proc."""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / CLK_TCK
+    rss, threads = 0.0, 0
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                rss = int(line.split()[1]) / 1024
+            elif line.startswith("Threads:"):
+                threads = int(line.split()[1])
+    return cpu, rss, threads
+
+def profile_call(action, query=""):
+    url = f"http://127.0.0.1:{WEB_PORT}/profile/{action}{query}"
+    with urllib.request.urlopen(urllib.request.Request(url, method="POST"), timeout=30) as resp:
+        return resp.read()
+
+# --- Statistics ---
+
+def percentile(sorted_vals, p):
+    if not sorted_vals:
+        return None
+    return sorted_vals[min(len(sorted_vals) - 1, int(len(sorted_vals) * p / 100))]
+
+def summarize(group, all_recorders):
+    """
+    Latency / drop / backlog stats for one group of subscribers.
+    A seq is only dropped if it is missing below the highest seq that
+    subscriber itself received. Anything between its highest seq and the
+    newest one any subscriber saw is still queued on the way (e.g. in the
+    /ws send backlog) and is reported as 'behind' instead.
+    """
+    first, last = {}, {}
+    for r in all_recorders:
+        for node, seqs in r.seqs.items():
+            first[node] = min(first.get(node, min(seqs)), min(seqs))
+            last[node] = max(last.get(node, max(seqs)), max(seqs))
+
+    lats, end_lats, received, dropped, behind, behind_max = [], [], 0, 0, 0, 0
+    for r in group:
+        lats.extend(r.latencies)
+        if r.last_latency is not None:
+            end_lats.append(r.last_latency)
+        for node in last:
+            seqs = r.seqs.get(node, ())
+            received += len(seqs)
+            if seqs:
+                dropped += max(seqs) - min(seqs) + 1 - len(seqs)
+                lag = last[node] - max(seqs)
+            else:
+                lag = last[node] - first[node] + 1
+            behind += lag
+            behind_max = max(behind_max, lag)
+
+    lats.sort()
+    ms = lambda v: None if v is None else round(v * 1000, 2)
+    return {
+        "clients": len(group),
+        "received": received,
+        "dropped": dropped,
+        "drop_pct": round(100 * dropped / (received + dropped), 2) if received + dropped else 0.0,
+        "behind": behind,
+        "behind_max_seq": behind_max,
+        "lat_p50_ms": ms(percentile(lats, 50)),
+        "lat_p95_ms": ms(percentile(lats, 95)),
+        "lat_p99_ms": ms(percentile(lats, 99)),
+        "lat_max_ms": ms(lats[-1] if lats else None),
+        # Age of the last value each client got before the window closed (worst client)
+        "lat_end_ms": ms(max(end_lats) if end_lats else None),
+    }
+
+# --- Steps ---
+
+async def measure(pid, recorders, ws_specs, args, profile_path=None):
+    ws_url = f"ws://127.0.0.1:{WEB_PORT}/ws"
+    tasks = [asyncio.create_task(ws_client(ws_url, r, d)) for r, d in ws_specs]
+
+    await asyncio.sleep(args.warmup)
+    if ws_failures(tasks):
+        await stop_ws(tasks)
+    if profile_path:
+        await asyncio.to_thread(profile_call, "start", f"?mode={args.profile_mode}")
+    for r in recorders:
+        r.active = True
+    cpu0, _, _ = proc_sample(pid)
+    t0 = time.time()
+
+    await asyncio.sleep(args.duration)
+
+    for r in recorders:
+        r.active = False
+    cpu1, rss, threads = proc_sample(pid)
+    wall = time.time() - t0
+    if profile_path:
+        data = await asyncio.to_thread(profile_call, "stop")
+        with open(profile_path, "wb") as f:
+            f.write(data)
+
+    await stop_ws(tasks)
+    return {"cpu_pct": round(100 * (cpu1 - cpu0) / wall, 1), "rss_mb": round(rss, 1), "threads": threads}
+
+def run_step(pid, n_opc, n_ws, args, user, pwd):
+    node_ids = [f"ns=2;s=Load_{i}" for i in range(args.items)]
+    url = f"opc.tcp://127.0.0.1:{args.opc_port}/"
+
+    sessions = []
+    try:
+        for _ in range(n_opc):
+            s = OpcSession(url, user, pwd, node_ids, args.publish_ms)
+            s.start()
+            sessions.append(s)
+
+        n_slow = min(args.slow_ws, n_ws)
+        fast = [Recorder() for _ in range(n_ws - n_slow)]
+        slow = [Recorder() for _ in range(n_slow)]
+        ws_specs = [(r, 0) for r in fast] + [(r, args.slow_delay) for r in slow]
+
+        opc = [s.recorder for s in sessions]
+        everyone = opc + fast + slow
+        profile_path = None
+        if args.profile_dir:
+            ext = "folded" if args.profile_mode == "sampling" else "prof"
+            profile_path = os.path.join(args.profile_dir, f"opc{n_opc}_ws{n_ws}.{ext}")
+        proc = asyncio.run(measure(pid, everyone, ws_specs, args, profile_path))
+    finally:
+        for s in sessions:
+            s.stop()
+
+    return {
+        "opc_clients": n_opc,
+        "ws_clients": n_ws,
+        "items": args.items,
+        "profile_mode": args.profile_mode if args.profile_dir else None,
+        "gateway": proc,
+        "opc": summarize(opc, everyone),
+        "ws_fast": summarize(fast, everyone),
+        "ws_slow": summarize(slow, everyone),
+    }
+
+def parse_counts(text):
+    return [int(x) for x in str(text).split(",") if x.strip()]
+
+def print_row(res):
+    g = res["gateway"]
+    def cell(s):
+        if not s["clients"]:
+            return "-"
+        return (f"p50={s['lat_p50_ms']}ms p99={s['lat_p99_ms']}ms drop={s['drop_pct']}% "
+                f"behind={s['behind_max_seq']}seq end={s['lat_end_ms']}ms")
+    profiled = f" [profiled: {res['profile_mode']}]" if res["profile_mode"] else ""
+    print(f"opc={res['opc_clients']:<4} ws={res['ws_clients']:<4} "
+          f"cpu={g['cpu_pct']:>6}% rss={g['rss_mb']:>7}MB thr={g['threads']:<4} | "
+          f"OPC {cell(res['opc'])} | WS {cell(res['ws_fast'])} | WS-slow {cell(res['ws_slow'])}{profiled}")
+
+def main():
+    p = argparse.ArgumentParser(description="OPC UA / WebSocket fan-out load test against a synthetic gateway")
+    p.add_argument("--opc-clients", default="1,5,10", help="OPC UA sessions per step, comma separated")
+    p.add_argument("--ws-clients", default="1,5,10", help="/ws clients per step, comma separated")
+    p.add_argument("--slow-ws", type=int, default=1, help="How many of the /ws clients per step are slow")
+    p.add_argument("--slow-delay", type=float, default=0.5, help="Seconds a slow /ws client sleeps per message")
+    p.add_argument("--items", type=int, default=10, help="Monitored items per OPC UA session (= gateway nodes)")
+    p.add_argument("--poll-interval", type=float, default=0.1, help="Gateway poll interval in seconds")
+    p.add_argument("--publish-ms", type=int, default=50, help="OPC UA subscription publishing interval")
+    p.add_argument("--duration", type=float, default=20, help="Measurement window per step in seconds")
+    p.add_argument("--warmup", type=float, default=3, help="Settle time before each window in seconds")
+    p.add_argument("--opc-port", type=int, default=4840)
+    p.add_argument("--json", help="Write the per-step results to this file")
+    p.add_argument("--profile-dir", help="Profile the gateway during each window and save the result here")
+    p.add_argument("--profile-mode", default="sampling", choices=["sampling", "cprofile"])
+    args = p.parse_args()
+
+    opc_steps, ws_steps = parse_counts(args.opc_clients), parse_counts(args.ws_clients)
+    n = max(len(opc_steps), len(ws_steps))
+    if len(opc_steps) == 1: opc_steps *= n
+    if len(ws_steps) == 1: ws_steps *= n
+    if len(opc_steps) != len(ws_steps):
+        p.error("--opc-clients and --ws-clients need the same number of steps (or a single value)")
+
+    env = dict(os.environ)
+    env.setdefault("OPC_UA_USER", "loadtest:loadtest")
+    user, pwd = env["OPC_UA_USER"].split(":", 1)
+
+    if args.profile_dir:
+        os.makedirs(args.profile_dir, exist_ok=True)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="neoedge_load_") as workdir:
+        proc = spawn_gateway(workdir, args, env)
+        try:
+            for n_opc, n_ws in zip(opc_steps, ws_steps):
+                res = run_step(proc.pid, n_opc, n_ws, args, user, pwd)
+                results.append(res)
+                print_row(res)
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -9,14 +9,24 @@ from datetime import datetime
 # Local module imports
 import neo_opcua
 import web
+import profiler
 from logHelper import logger
-from modbus_base import validate_config
+from modbus_base import validate_config, slave_type
 from modbus_tcp import ModbusTCPHandler
 from modbus_rtu import ModbusRTUHandler
+from modbus_sim import SimHandler, ReplayHandler
 
 # Global dictionary to store our communication instances
 handlers = {}
 
+# Slave 'type' -> handler class (see modbus_base.SLAVE_TYPES)
+HANDLER_TYPES = {
+    "tcp": ModbusTCPHandler,
+    "rtu": ModbusRTUHandler,
+    "sim": SimHandler,
+    "replay": ReplayHandler,
+}
+
 async def main():
     tag_cache = {}
     cache_lock = Lock()
@@ -39,15 +49,12 @@ async def main():
         sys.exit(1)
 
     # 2. Initialize Modbus Handlers (Factory Pattern)
-    # We distinguish between TCP and RTU by checking for an 'ip' key
+    # 'type' selects the handler; without it we distinguish TCP and RTU by the 'ip' key
     for name, s in cfg["modbus"]["slaves"].items():
         try:
-            if "ip" in s:
-                handlers[name] = ModbusTCPHandler(name, s)
-                logger.info(f"Initialized Modbus TCP: {name} ({s['ip']})")
-            else:
-                handlers[name] = ModbusRTUHandler(name, s)
-                logger.info(f"Initialized Modbus RTU: {name} ({s['port']})")
+            stype = slave_type(s)
+            handlers[name] = HANDLER_TYPES[stype](name, s)
+            logger.info(f"Initialized {stype.upper()} slave: {name} ({s.get('ip') or s.get('port') or s.get('file', 'synthetic')})")
         except Exception as e:
             logger.error(f"Failed to initialize slave {name}: {e}")
 
@@ -81,54 +88,55 @@ async def main():
     def poll_loop():
         logger.info("Starting Modbus Polling Loop...")
         while True:
-            for node, m in node_map.items():
-                slave_name = m["slave"]
-                handler = handlers.get(slave_name)
-                node_id_str = node.nodeid.to_string()
+            with profiler.poll_cycle():
+                for node, m in node_map.items():
+                    slave_name = m["slave"]
+                    handler = handlers.get(slave_name)
+                    node_id_str = node.nodeid.to_string()
                 
-                if not handler:
-                    continue
+                    if not handler:
+                        continue
 
-                try:
-                    # Perform the read (Logic inside modbus_base.py)
-                    val = handler.read(m)
+                    try:
+                        # Perform the read (Logic inside modbus_base.py)
+                        val = handler.read(m)
                     
-                    if val is None:
-                        raise Exception(f"Slave {slave_name} returned no data")
+                        if val is None:
+                            raise Exception(f"Slave {slave_name} returned no data")
                     
-                    # Update OPC UA internal value
-                    node.set_value(val)
+                        # Update OPC UA internal value
+                        node.set_value(val)
                     
-                    # Prepare success payload for Web UI
-                    payload = {
-                        "name": node.get_display_name().Text, 
-                        "value": val, 
-                        "time": datetime.now().strftime("%H:%M:%S"), 
-                        "dir": "read", 
-                        "status": "online"
-                    }
-                except Exception as e:
-                    # Prepare error payload for Web UI
-                    payload = {
-                        "name": node.get_display_name().Text, 
-                        "value": "ERR", 
-                        "time": datetime.now().strftime("%H:%M:%S"), 
-                        "dir": "read", 
-                        "status": "offline"
-                    }
-                    # Small sleep on error to prevent CPU hammering if connection is dead
-                    time.sleep(0.1) 
+                        # Prepare success payload for Web UI
+                        payload = {
+                            "name": node.get_display_name().Text, 
+                            "value": val, 
+                            "time": datetime.now().strftime("%H:%M:%S"), 
+                            "dir": "read", 
+                            "status": "online"
+                        }
+                    except Exception as e:
+                        # Prepare error payload for Web UI
+                        payload = {
+                            "name": node.get_display_name().Text, 
+                            "value": "ERR", 
+                            "time": datetime.now().strftime("%H:%M:%S"), 
+                            "dir": "read", 
+                            "status": "offline"
+                        }
+                        # Small sleep on error to prevent CPU hammering if connection is dead
+                        time.sleep(0.1) 
                 
-                # Atomic update of the cache and broadcast via WebSocket
-                with cache_lock:
-                    tag_cache[node_id_str] = payload
-                neo_opcua.push_ws(node_id_str, payload)
+                    # Atomic update of the cache and broadcast via WebSocket
+                    with cache_lock:
+                        tag_cache[node_id_str] = payload
+                    neo_opcua.push_ws(node_id_str, payload)
                 
             # Master polling interval
             time.sleep(interval)
 
     # Daemon thread ensures the loop exits when the main program stops
-    threading.Thread(target=poll_loop, daemon=True).start()
+    threading.Thread(target=poll_loop, daemon=True, name="poll").start()
     
     print("NeoEdge Gateway is fully operational.")
     logger.info("Gateway fully operational.")
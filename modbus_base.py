@@ -1,6 +1,16 @@
-import struct, yaml
+import os, json, time, struct, yaml
 from logHelper import logger
 
+# Handler types selectable per slave with 'type' (main.py maps them to classes)
+SLAVE_TYPES = ("tcp", "rtu", "sim", "replay")
+
+# Per-node value sources for type: "sim" (set with 'sim: {generator: ...}' in the node's modbus block)
+GENERATORS = ("stamp", "counter", "ramp", "sine", "random", "constant")
+
+def slave_type(s):
+    """Explicit 'type', otherwise TCP vs RTU is decided by the 'ip' key"""
+    return s.get("type", "tcp" if "ip" in s else "rtu")
+
 def validate_config(file_path):
     """
     Returns (True, "") if valid, (False, "Error Message") if invalid.
@@ -19,9 +29,19 @@ def validate_config(file_path):
             return False, "No Modbus slaves defined"
         
         for name, s in slaves.items():
-            if "ip" not in s and "port" not in s:
+            if "type" not in s and "ip" not in s and "port" not in s:
                 return False, f"Slave '{name}' needs an 'ip' (TCP) or 'port' (RTU)"
 
+            stype = slave_type(s)
+            if stype not in SLAVE_TYPES:
+                return False, f"Slave '{name}' has unknown type '{stype}' (use {', '.join(SLAVE_TYPES)})"
+            if stype == "tcp" and "ip" not in s:
+                return False, f"Slave '{name}' of type 'tcp' needs an 'ip'"
+            if stype == "rtu" and "port" not in s:
+                return False, f"Slave '{name}' of type 'rtu' needs a 'port'"
+            if stype == "replay" and not os.path.exists(s.get("file", "")):
+                return False, f"Replay slave '{name}' capture file not found: {s.get('file')}"
+
         # 3. Validate Nodes
         for node in cfg["nodes"]:
             required_node_keys = ["node_id", "name", "modbus"]
@@ -35,6 +55,19 @@ def validate_config(file_path):
             if m["datatype"] not in ["int16", "uint16", "int32", "uint32", "float", "double", "bool", "string"]:
                 return False, f"Invalid datatype '{m['datatype']}' in node '{node['name']}'"
 
+            # Optional; without 'generator' the sim handler picks stamp / counter
+            if "sim" in m:
+                if not isinstance(m["sim"], dict):
+                    return False, f"'sim' in node '{node['name']}' must be a mapping, e.g. {{generator: sine}}"
+                gen = m["sim"].get("generator")
+                if gen is not None and gen not in GENERATORS:
+                    return False, f"Invalid sim generator '{gen}' in node '{node['name']}' (use {', '.join(GENERATORS)})"
+                if gen == "stamp" and m["datatype"] != "string":
+                    return False, f"Sim generator 'stamp' needs datatype 'string' in node '{node['name']}'"
+                period = m["sim"].get("period", 60)
+                if gen == "sine" and not (isinstance(period, (int, float)) and period > 0):
+                    return False, f"Sim generator 'sine' needs a positive 'period' in node '{node['name']}'"
+
         return True, ""
     except Exception as e:
         return False, f"YAML Syntax Error: {str(e)}"
@@ -47,6 +80,24 @@ TYPE_MAP = {
 }
 
 class ModbusBase:
+    # Open file when the slave has 'capture_file' set (see start_capture)
+    capture = None
+
+    def start_capture(self, path):
+        """Appends every raw read response to a JSON-lines file for later replay (type: "replay")"""
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.capture = open(path, "a", buffering=1)
+        logger.info(f"Capturing raw reads of {self.name} to {path}")
+
+    def record_capture(self, r, m):
+        rec = {"t": time.time(), "slave": self.name, "function": m["function"], "address": m["address"]}
+        if m["function"] == "coil":
+            rec["bits"] = [bool(b) for b in r.bits]
+        else:
+            rec["registers"] = list(r.registers)
+        self.capture.write(json.dumps(rec) + "\n")
+
     def handle_swaps(self, raw_bytes, byte_swap, word_swap):
         data = bytearray(raw_bytes)
         if byte_swap:
@@ -61,6 +112,9 @@ class ModbusBase:
 
     def decode_response(self, r, m, b_swap, w_swap):
         dtype = m["datatype"]
+        if self.capture:
+            self.record_capture(r, m)
+
         # Handle Coils
         if m["function"] == "coil":
             return bool(r.bits[0])
@@ -71,29 +125,38 @@ class ModbusBase:
         
         if dtype == "string":
             return raw.decode('utf-8', errors='ignore').strip('\x00')
+
+        # A bool register is True when any byte is non-zero (works with swaps)
+        if dtype == "bool":
+            return any(raw)
         
         return struct.unpack(">" + TYPE_MAP[dtype][1], raw)[0]
     
-    def write_value(self, client, slave_id, m, val, b_swap, w_swap):
-        addr = m["address"] - 1
+    def encode_registers(self, m, val, b_swap, w_swap):
+        """Inverse of decode_response: value -> register list [int16, int16...]"""
         dtype = m["datatype"]
 
-        # 1. Handle Coils
-        if m["function"] == "coil":
-            return client.write_coil(addr, bool(val), unit=slave_id)
-
-        # 2. Handle Registers (Holding)
         if dtype == "string":
             # Strings must be padded to the correct length (2 bytes per register)
-            raw = str(val).encode('utf-8').ljust(m["length"] * 2, b'\x00')
+            raw = str(val).encode('utf-8').ljust(m.get("length", 1) * 2, b'\x00')
         else:
             # Pack numbers/booleans using the TYPE_MAP
             raw = struct.pack(">" + TYPE_MAP[dtype][1], val)
 
-        # 3. Apply Swaps
+        # Apply Swaps
         raw = self.handle_swaps(raw, b_swap, w_swap)
 
-        # 4. Convert bytes back to register list [int16, int16...]
-        regs = [int.from_bytes(raw[i:i+2], "big") for i in range(0, len(raw), 2)]
+        # Convert bytes back to register list [int16, int16...]
+        return [int.from_bytes(raw[i:i+2], "big") for i in range(0, len(raw), 2)]
+
+    def write_value(self, client, slave_id, m, val, b_swap, w_swap):
+        addr = m["address"] - 1
+
+        # 1. Handle Coils
+        if m["function"] == "coil":
+            return client.write_coil(addr, bool(val), unit=slave_id)
+
+        # 2. Handle Registers (Holding)
+        regs = self.encode_registers(m, val, b_swap, w_swap)
         
         return client.write_registers(addr, regs, unit=slave_id)
\ No newline at end of file
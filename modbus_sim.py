@@ -0,0 +1,172 @@
+import json
+import math
+import time
+import bisect
+import random
+import threading
+from modbus_base import ModbusBase, TYPE_MAP, GENERATORS
+from logHelper import logger
+
+class SimResponse:
+    """Stands in for a pymodbus read response so values go through ModbusBase.decode_response"""
+    def __init__(self, registers=None, bits=None):
+        self.registers = registers or []
+        self.bits = bits or []
+
+    def isError(self):
+        return False
+
+class SimHandler(ModbusBase):
+    """
+    Synthetic slave (type: "sim") - no hardware behind it.
+    Values are generated per node and step (the node's read count), so a run
+    is reproducible for a given 'seed'. Generators:
+      - stamp:    "<seq>@<unix time>" (default for strings, used by loadtest.py)
+      - counter:  offset + step * seq (default for numbers)
+      - ramp:     min -> max in 'step' increments, then wraps
+      - sine:     offset + amplitude * sin(2*pi * seq / period)
+      - random:   uniform in [min, max], seeded per node
+      - constant: 'value'
+    Generated values are encoded to registers and decoded again, so reads cost
+    the same struct/swap work as a real slave.
+    """
+    def __init__(self, name, slave_config):
+        self.name = name
+        self.lock = threading.Lock()
+        self.seed = slave_config.get("seed", 0)
+        self.b_swap = slave_config.get("byte_swap", False)
+        self.w_swap = slave_config.get("word_swap", False)
+        self.seq = {}
+        self.rngs = {}
+
+    def generate(self, m, key, n):
+        g = m.get("sim", {})
+        kind = g.get("generator", "stamp" if m["datatype"] == "string" else "counter")
+
+        if kind == "stamp":
+            return f"{n}@{time.time():.6f}"
+        if kind == "counter":
+            return g.get("offset", 0) + g.get("step", 1) * n
+        if kind == "ramp":
+            lo, hi = g.get("min", 0), g.get("max", 100)
+            return lo + (g.get("step", 1) * n) % ((hi - lo) or 1)
+        if kind == "sine":
+            return g.get("offset", 0) + g.get("amplitude", 1) * math.sin(2 * math.pi * n / g.get("period", 60))
+        if kind == "random":
+            if key not in self.rngs:
+                self.rngs[key] = random.Random(f"{self.seed}:{key[0]}:{key[1]}")
+            return self.rngs[key].uniform(g.get("min", 0), g.get("max", 100))
+        if kind == "constant":
+            return g.get("value", 0)
+        raise ValueError(f"Unknown sim generator '{kind}'")
+
+    def fit(self, m, val):
+        """Coerces a generated value into the node's datatype (integers wrap like registers do)"""
+        dtype = m["datatype"]
+        if dtype == "string":
+            # Whole registers only; decode_response strips the padding again
+            text = str(val)
+            return text + "\x00" if len(text.encode("utf-8")) % 2 else text
+        if dtype == "bool":
+            # Parity, so the default counter toggles
+            return bool(int(val) & 1)
+        if dtype in ("float", "double"):
+            return float(val)
+        bits = TYPE_MAP[dtype][0] * 16
+        v = int(val) % (1 << bits)
+        if dtype.startswith("int") and v >= 1 << (bits - 1):
+            v -= 1 << bits
+        return v
+
+    def read(self, m):
+        key = (m["function"], m["address"])
+        with self.lock:
+            n = self.seq.get(key, 0) + 1
+            self.seq[key] = n
+            val = self.generate(m, key, n)
+
+        if m["function"] == "coil":
+            r = SimResponse(bits=[self.fit({"datatype": "bool"}, val)])
+        else:
+            r = SimResponse(registers=self.encode_registers(m, self.fit(m, val), self.b_swap, self.w_swap))
+        return self.decode_response(r, m, self.b_swap, self.w_swap)
+
+    def write(self, m, val):
+        # Nothing to write to - accept and drop
+        return None
+
+class ReplayHandler(ModbusBase):
+    """
+    Replays a capture recorded with 'capture_file' on a TCP/RTU slave (type: "replay").
+    Raw registers go through decode_response, so byte_swap / word_swap must
+    match the slave the capture came from.
+      - speed: 1.0 = real time, 10 = ten times faster, 0 = next frame on every read
+      - loop:  start over at the end of the capture (default true)
+      - source: only use records of this slave name from the capture
+    """
+    def __init__(self, name, slave_config):
+        self.name = name
+        self.lock = threading.Lock()
+        self.speed = float(slave_config.get("speed", 1.0))
+        self.loop = slave_config.get("loop", True)
+        self.b_swap = slave_config.get("byte_swap", False)
+        self.w_swap = slave_config.get("word_swap", False)
+        self.frames, self.duration = self.load(slave_config["file"], slave_config.get("source"))
+        # One loop = capture length plus one poll period, so the last frame gets its turn too
+        self.cycle = self.duration + self.frame_period()
+        self.step = {}
+        self.start = time.monotonic()
+        logger.info(f"Replay {name}: {len(self.frames)} addresses, {self.duration:.1f}s from {slave_config['file']}")
+
+    def load(self, path, source):
+        """Returns ({(function, address): ([t, ...], [record, ...])}, capture length in seconds)"""
+        records = []
+        with open(path, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                rec = json.loads(line)
+                if source is None or rec.get("slave") == source:
+                    records.append(rec)
+        if not records:
+            return {}, 0.0
+
+        t0 = min(rec["t"] for rec in records)
+        frames = {}
+        for rec in sorted(records, key=lambda r: r["t"]):
+            times, data = frames.setdefault((rec["function"], rec["address"]), ([], []))
+            times.append(rec["t"] - t0)
+            data.append(rec)
+        return frames, max(rec["t"] for rec in records) - t0
+
+    def frame_period(self):
+        """Average spacing between frames of the most-polled address (0 if unknown)"""
+        times = max((t for t, _ in self.frames.values()), key=len, default=[])
+        return (times[-1] - times[0]) / (len(times) - 1) if len(times) > 1 else 0.0
+
+    def read(self, m):
+        frames = self.frames.get((m["function"], m["address"]))
+        if not frames:
+            return None
+        times, data = frames
+
+        with self.lock:
+            if self.speed > 0:
+                pos = (time.monotonic() - self.start) * self.speed
+                if self.loop and self.cycle > 0:
+                    pos %= self.cycle
+                i = max(bisect.bisect_right(times, pos) - 1, 0)
+            else:
+                key = (m["function"], m["address"])
+                i = self.step.get(key, 0)
+                if i >= len(data):
+                    i = 0 if self.loop else len(data) - 1
+                self.step[key] = i + 1
+
+        rec = data[i]
+        r = SimResponse(registers=rec.get("registers"), bits=rec.get("bits"))
+        return self.decode_response(r, m, self.b_swap, self.w_swap)
+
+    def write(self, m, val):
+        # A capture is read-only
+        return None
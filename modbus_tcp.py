@@ -10,6 +10,8 @@ class ModbusTCPHandler(ModbusBase):
         self.lock = threading.Lock()
         self.b_swap = slave_config.get("byte_swap", False)
         self.w_swap = slave_config.get("word_swap", False)
+        if slave_config.get("capture_file"):
+            self.start_capture(slave_config["capture_file"])
 
     def read(self, m):
         with self.lock:
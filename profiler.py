@@ -0,0 +1,146 @@
+import os
+import sys
+import time
+import marshal
+import cProfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from logHelper import logger
+
+# Runtime profiling of the gateway, toggled from web.py (/profile/start, /profile/stop).
+#  - "sampling": wall-clock stack samples of every thread (poll, OPC UA, web),
+#                returned as folded stacks for flamegraph.pl / speedscope
+#  - "cprofile": deterministic cProfile of the poll thread (see poll_cycle),
+#                returned as a .prof file for snakeviz / flameprof / pstats
+# cProfile cannot attach to threads that are already running, hence the split.
+#
+# The sampler is an in-process thread: a sample is kept only if that thread's
+# own CPU clock advanced since the previous tick, so blocked threads (sleep,
+# select, uvloop's C event loop, lock waits) do not show up as busy. Samples
+# are still taken only when the sampler holds the GIL, and a thread that just
+# went idle is charged to its current stack, so treat the result as an
+# approximation. For unbiased CPU profiles of the live process, use an
+# out-of-process sampler instead, e.g. `py-spy record --format raw -p <pid>`.
+
+MODES = ("sampling", "cprofile")
+
+# Globals for the active session
+lock = threading.Lock()
+# Held by the poll thread while cProfile is enabled for one cycle (see poll_cycle)
+cycle_lock = threading.Lock()
+mode = None
+sampler = None
+cprof = None
+started = None
+
+def thread_cpu(ident):
+    """CPU seconds used by one thread so far, None if unknown (thread gone, or no per-thread clocks)"""
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(ident))
+    except (AttributeError, OSError):
+        return None
+
+class StackSampler(threading.Thread):
+    def __init__(self, hz, idle=False):
+        super().__init__(daemon=True, name="profiler")
+        self.interval = 1.0 / hz
+        self.idle = idle
+        self.stacks = Counter()
+        self.idle_samples = 0
+        self.cpu = {}  # thread ident -> CPU seconds at the previous tick
+        self.stop_event = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                cpu, prev = thread_cpu(ident), self.cpu.get(ident)
+                self.cpu[ident] = cpu
+                stack = []
+                # Without a CPU reading every sample counts as busy
+                if cpu is not None and (prev is None or cpu <= prev):
+                    self.idle_samples += 1
+                    if not self.idle:
+                        continue
+                    stack.append("[idle]")
+
+                # Leaf frame keeps its current line, callers are grouped per function
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def folded(self):
+        """One 'thread;outer;...;inner count' line per distinct stack"""
+        return "\n".join(f"{stack} {n}" for stack, n in self.stacks.most_common()) + "\n"
+
+def start(mode_="sampling", hz=100, idle=False):
+    """idle=True keeps samples of blocked threads, tagged with an '[idle]' leaf frame"""
+    global mode, sampler, cprof, started
+    if mode_ not in MODES:
+        raise ValueError(f"Unknown profiling mode '{mode_}' (use {', '.join(MODES)})")
+    if not 1 <= hz <= 1000:
+        raise ValueError("Sampling rate must be between 1 and 1000 Hz")
+
+    with lock:
+        if mode:
+            raise RuntimeError(f"Profiler already running ({mode})")
+        if mode_ == "sampling":
+            sampler = StackSampler(hz, idle)
+            sampler.start()
+        else:
+            cprof = cProfile.Profile()
+        mode, started = mode_, time.time()
+    logger.info(f"Profiler started ({mode_})")
+
+def stop():
+    """Stops the session and returns (mode, seconds, data): folded stacks text or .prof bytes"""
+    global mode, sampler, cprof, started
+    with lock:
+        if not mode:
+            raise RuntimeError("Profiler is not running")
+        mode_, elapsed = mode, time.time() - started
+        if mode_ == "sampling":
+            sampler.stop_event.set()
+            sampler.join()
+            data = sampler.folded()
+            logger.info(f"Profiler saw {sampler.idle_samples} idle samples ({'kept' if sampler.idle else 'left out'})")
+        else:
+            prof, cprof = cprof, None
+        mode, sampler, started = None, None, None
+
+    if mode_ == "cprofile":
+        # Let a poll cycle that is still recording call prof.disable() first
+        with cycle_lock:
+            pass
+        # Same bytes Profile.dump_stats() would write, without a temp file
+        prof.create_stats()
+        data = marshal.dumps(prof.stats)
+    logger.info(f"Profiler stopped ({mode_}, {elapsed:.1f}s)")
+    return mode_, elapsed, data
+
+@contextmanager
+def poll_cycle():
+    """Wraps one pass of the poll loop; records it when cProfile mode is on"""
+    if cprof is None:
+        yield
+        return
+    with cycle_lock:
+        # Re-check under the lock: stop() may have taken the profiler meanwhile
+        prof = cprof
+        if prof is not None:
+            prof.enable()
+        try:
+            yield
+        finally:
+            if prof is not None:
+                prof.disable()
@@ -1,8 +1,9 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, HTTPException
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, Response
 import os, sys, shutil, uvicorn, threading, asyncio, zipfile, io
 from logHelper import logger
 from modbus_base import validate_config
+import profiler
 import modbus_tcp
 
 class WSManager:
@@ -96,6 +97,36 @@ async def download_logs_all():
         headers={"Content-Disposition": "attachment; filename=all_logs.zip"}
     )
 
+@app.post("/profile/start")
+async def profile_start(mode: str = "sampling", hz: int = 100, idle: bool = False):
+    try:
+        profiler.start(mode, hz, idle)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"status": "profiling", "mode": mode}
+
+# Plain def: stopping joins the sampler thread and marshals the stats,
+# so FastAPI runs it in its threadpool instead of on the event loop
+@app.post("/profile/stop")
+def profile_stop():
+    try:
+        mode, elapsed, data = profiler.stop()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    # sampling -> folded stacks (flamegraph.pl / speedscope), cprofile -> pstats file
+    if mode == "sampling":
+        filename, media_type = "profile.folded", "text/plain"
+    else:
+        filename, media_type = "profile.prof", "application/octet-stream"
+    return Response(
+        content=data,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}", "X-Profile-Seconds": f"{elapsed:.1f}"}
+    )
+
 @app.websocket("/ws")
 async def websocket_endpoint(ws: WebSocket):
     await ws_mgr.connect(ws)
@@ -113,4 +144,4 @@ def start_web(cache, lock, host="0.0.0.0", port=8080):
     global tag_cache, cache_lock
     tag_cache, cache_lock = cache, lock
     # Run Uvicorn in a daemon thread so it doesn't block the main gateway logic
-    threading.Thread(target=lambda: uvicorn.run(app, host=host, port=port, log_level="error"), daemon=True).start()
\ No newline at end of file
+    threading.Thread(target=lambda: uvicorn.run(app, host=host, port=port, log_level="error"), daemon=True, name="web").start()
\ No newline at end of file